@@ -4,19 +4,197 @@ File Transfer Client
 Supports downloading single/multiple files with progress tracking
 """
 
+import asyncio
+import hashlib
 import socket
+import struct
 import json
+import zlib
 import os
+import queue
+import threading
 import time
 from typing import List
 
+# orjson (optional) encodes/decodes in C; fall back to the standard library.
+# Either way messages are UTF-8 JSON bytes on the wire.
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+    _loads = json.loads
+
+# Big-endian 4-byte length prefix of every control message
+_LEN = struct.Struct('>I')
+_LEN_UNPACK = _LEN.unpack_from
+_LEN_PACK = _LEN.pack
+
+# BLAKE3 (optional) is needed to verify downloads from servers that hash with it
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+# zstd is preferred when zstandard is installed; zlib is always available
+try:
+    import zstandard
+    SUPPORTED_COMPRESSION = ['zstd', 'zlib']
+except ImportError:
+    zstandard = None
+    SUPPORTED_COMPRESSION = ['zlib']
+
+class PrefetchBuffer:
+    """Bytes read from a socket ahead of what has been consumed, kept in a reused preallocated buffer"""
+    
+    def __init__(self, size, read_size):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.read_size = read_size  # Bytes asked for per recv when only a few more are needed
+        self.start = 0  # First unconsumed byte
+        self.end = 0  # End of the received bytes
+    
+    def __len__(self):
+        return self.end - self.start
+    
+    def clear(self):
+        """Drop any buffered bytes"""
+        self.start = self.end = 0
+    
+    def fill(self, sock, needed):
+        """Receive until at least needed bytes are buffered; False if the connection closed first"""
+        while self.end - self.start < needed:
+            if self.start + needed > len(self.buffer):
+                self.compact(needed)
+            want = max(self.read_size, needed - (self.end - self.start))
+            n = sock.recv_into(self.view[self.end:], min(want, len(self.buffer) - self.end))
+            if not n:
+                return False
+            self.end += n
+        return True
+    
+    def compact(self, needed):
+        """Move the unconsumed bytes to the front, growing the buffer only if needed does not fit"""
+        unread = self.end - self.start
+        if needed > len(self.buffer):
+            buffer = bytearray(needed)
+            buffer[:unread] = self.view[self.start:self.end]
+            self.buffer, self.view = buffer, memoryview(buffer)
+        else:
+            self.view[:unread] = self.view[self.start:self.end]
+        self.start, self.end = 0, unread
+    
+    def consume(self, nbytes):
+        """Mark nbytes as consumed"""
+        self.start += nbytes
+        if self.start == self.end:
+            self.start = self.end = 0
+    
+    def read_message(self, sock):
+        """Return the next length-prefixed message, or None if the connection closed first"""
+        if not self.fill(sock, _LEN.size):
+            return None
+        (message_length,) = _LEN_UNPACK(self.buffer, self.start)
+        total = _LEN.size + message_length
+        if not self.fill(sock, total):
+            return None
+        message = bytes(self.view[self.start + _LEN.size:self.start + total])
+        self.consume(total)
+        return message
+    
+    def read_into(self, buffer, nbytes):
+        """Copy up to nbytes of the buffered bytes into buffer; returns how many were copied"""
+        n = min(self.end - self.start, nbytes)
+        buffer[:n] = self.view[self.start:self.start + n]
+        self.consume(n)
+        return n
+
+class DownloadSink:
+    """Decompresses, hashes and writes the received data stream of one download"""
+    
+    def __init__(self, client, filepath, file_info):
+        self.client = client
+        self.file_info = file_info
+        self.digest = client.new_digest(file_info)
+        self.decompressor = client.new_decompressor(file_info)
+        self.fd = client.open_download(filepath, file_info['file_size'])
+        self.written = 0
+    
+    def write(self, data):
+        """Consume the next piece of the received stream"""
+        if self.decompressor is not None:
+            data = self.decompressor.decompress(data)
+        self.written = self.client.write_at(self.fd, data, self.written)
+        if self.digest is not None:
+            self.digest.update(data)
+    
+    def close(self):
+        """Flush buffered decompressor output and close the file"""
+        try:
+            if self.decompressor is not None:
+                data = self.decompressor.flush()
+                self.written = self.client.write_at(self.fd, data, self.written)
+                if self.digest is not None:
+                    self.digest.update(data)
+        finally:
+            self.client.close_download(self.fd, self.written, self.file_info['file_size'])
+    
+    def verify(self):
+        """Check the written data against the digest announced by the server"""
+        return self.client.verify_digest(self.digest, self.file_info)
+
+class ReceiveProgress:
+    """Tracks how much of a file's data stream has arrived and reports progress per chunk"""
+    
+    def __init__(self, file_info):
+        self.filename = file_info['filename']
+        self.stream_size = file_info.get('stream_size', file_info['file_size'])
+        self.chunk_size = file_info['chunk_size']
+        self.received = 0
+    
+    def done(self):
+        """True once the whole stream has been received"""
+        return self.received >= self.stream_size
+    
+    def next_read(self, max_read):
+        """Bytes to ask for next, never crossing a chunk boundary so progress is reported per chunk"""
+        # Chunk boundaries are derived from file_info rather than sent per chunk
+        chunk_end = min((self.received // self.chunk_size + 1) * self.chunk_size, self.stream_size)
+        return min(max_read, chunk_end - self.received)
+    
+    def advance(self, n):
+        """Record n received bytes, printing progress when a chunk completes"""
+        self.received += n
+        if self.received % self.chunk_size == 0 or self.received == self.stream_size:
+            chunk_num = (self.received + self.chunk_size - 1) // self.chunk_size
+            progress = (self.received / self.stream_size) * 100
+            print(f"Downloading {self.filename} part {chunk_num} .... {progress:.1f}%")
+
 class FileTransferClient:
-    def __init__(self, host='localhost', port=8888, download_directory='downloads'):
+    def __init__(self, host='localhost', port=8888, download_directory='downloads', unix_socket_path=None,
+                 compression=False, verify=None):
         self.host = host
         self.port = port
+        self.unix_socket_path = unix_socket_path  # Connect over a Unix domain socket instead of TCP
+        # Compression formats offered to the server, most preferred first. Opt-in, and never offered
+        # over a Unix socket, where compressing costs far more time than the bytes it saves
+        self.accept_compression = SUPPORTED_COMPRESSION if compression and not unix_socket_path else []
+        # Check downloads against the server's digest: True always, False never, None only when
+        # BLAKE3 is available (the hashlib fallbacks cost about as much as the transfer itself).
+        # The server only hashes files for clients that will check the digest.
+        self.verify = verify
         self.download_directory = download_directory
-        self.buffer_size = 4096
+        self.buffer_size = 65536
+        self.socket_buffer_size = 4 * 1024 * 1024  # 4MB kernel send/receive buffers
         self.socket = None
+        self.prefetch_size = 4096  # receive_message reads this much per recv and keeps the leftover
+        self._prefetch = PrefetchBuffer(self.buffer_size, self.prefetch_size)  # Bytes received but not yet consumed
+        self.pipeline_buffers = 32  # Receive buffers in flight between network and disk writer (2MB)
+        self.files_cache_ttl = 5.0  # Seconds a fetched file list is reused without asking again
+        self._files_cache = None
+        self._files_cache_ts = 0.0
         
         # Create download directory if it doesn't exist
         if not os.path.exists(self.download_directory):
@@ -26,71 +204,294 @@ class FileTransferClient:
     def connect(self):
         """Connect to the server"""
         try:
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self.host, self.port))
-            print(f"Connected to server at {self.host}:{self.port}")
+            self.socket, address = self.create_socket()
+            self.socket.connect(address)
+            self._prefetch.clear()
+            print(f"Connected to server at {self.describe_address()}")
             return True
         except Exception as e:
             print(f"Failed to connect to server: {e}")
             return False
     
+    def create_socket(self):
+        """Create a tuned, unconnected socket and return it with the server address"""
+        if self.unix_socket_path:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            address = self.unix_socket_path
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            address = (self.host, self.port)
+        self.configure_socket(sock)
+        return sock, address
+    
+    def describe_address(self):
+        """Human-readable server address"""
+        if self.unix_socket_path:
+            return f"unix:{self.unix_socket_path}"
+        return f"{self.host}:{self.port}"
+    
+    def configure_socket(self, sock):
+        """Tune a socket for small control messages and bulk file data"""
+        try:
+            if sock.family in (socket.AF_INET, socket.AF_INET6):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # Set before connecting so the window scale is negotiated for the larger buffer
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.socket_buffer_size)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.socket_buffer_size)
+        except OSError as e:
+            print(f"Could not set socket options: {e}")
+    
     def disconnect(self):
         """Disconnect from the server"""
         if self.socket:
             try:
                 disconnect_cmd = {'type': 'disconnect'}
-                self.send_message(json.dumps(disconnect_cmd))
+                self.send_message(_dumps(disconnect_cmd))
                 self.socket.close()
                 print("Disconnected from server")
             except:
                 pass
     
-    def send_message(self, message):
-        """Send a message with length prefix"""
-        message_bytes = message.encode('utf-8')
-        length_bytes = len(message_bytes).to_bytes(4, byteorder='big')
-        self.socket.send(length_bytes + message_bytes)
+    def send_message(self, message_bytes):
+        """Send an encoded message with length prefix"""
+        length_bytes = _LEN_PACK(len(message_bytes))
+        self.socket.sendall(length_bytes + message_bytes)
     
     def receive_message(self):
         """Receive a message with length prefix"""
         try:
-            # First receive the length of the message
-            length_data = self.socket.recv(4)
-            if not length_data:
-                return None
-            
-            message_length = int.from_bytes(length_data, byteorder='big')
-            
-            # Then receive the actual message
-            message_data = b''
-            while len(message_data) < message_length:
-                chunk = self.socket.recv(min(message_length - len(message_data), self.buffer_size))
-                if not chunk:
-                    return None
-                message_data += chunk
-            
-            return message_data.decode('utf-8')
+            # Read in prefetch-sized gulps so a small message usually takes a single recv;
+            # whatever follows it stays buffered for the next read
+            return self._prefetch.read_message(self.socket)
         except:
             return None
     
-    def list_files(self):
-        """Request and display list of available files from server"""
-        try:
-            list_cmd = {'type': 'list_files'}
-            self.send_message(json.dumps(list_cmd))
-            
-            response_data = self.receive_message()
-            if not response_data:
-                print("No response from server")
-                return []
+    def recv_into(self, buffer, nbytes):
+        """Receive up to nbytes into buffer, handing out prefetched bytes first"""
+        if self._prefetch:
+            return self._prefetch.read_into(buffer, nbytes)
+        return self.socket.recv_into(buffer, nbytes)
+    
+    def receive_file_data(self, sink):
+        """Receive the raw file data that follows file_info and feed it to sink"""
+        progress = ReceiveProgress(sink.file_info)
+        view = memoryview(bytearray(self.buffer_size))
+        
+        while not progress.done():
+            n = self.recv_into(view, progress.next_read(self.buffer_size))
+            if not n:
+                print("Connection lost during file transfer")
+                return False
             
-            response = json.loads(response_data)
+            sink.write(view[:n])
+            progress.advance(n)
+        
+        return True
+    
+    def receive_file_data_pipelined(self, file_info, jobs, free_buffers, writer_thread):
+        """Receive the raw file data that follows file_info into pooled buffers queued for the writer thread"""
+        progress = ReceiveProgress(file_info)
+        
+        while not progress.done():
+            buffer = self._take_buffer(free_buffers, writer_thread)
+            if buffer is None:
+                print("Disk writer stopped during file transfer")
+                return False
+            n = self.recv_into(buffer, progress.next_read(len(buffer)))
+            if not n:
+                free_buffers.put(buffer)
+                print("Connection lost during file transfer")
+                return False
             
-            if response['type'] == 'error':
-                print(f"Error: {response['message']}")
-                return []
+            jobs.put(('data', buffer, n))
+            progress.advance(n)
+        
+        return True
+    
+    def _take_buffer(self, free_buffers, writer_thread):
+        """Wait for a free receive buffer; None if the writer thread has died holding them"""
+        while True:
+            try:
+                return free_buffers.get(timeout=0.5)
+            except queue.Empty:
+                if not writer_thread.is_alive():
+                    return None
+    
+    def _write_downloads(self, jobs, free_buffers, results):
+        """Writer thread: apply queued open/data/close jobs, one download at a time"""
+        sink = None
+        failed = False
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            action = job[0]
+            succeeded = False
             
-            files = response['files']
+            try:
+                if action == 'open':
+                    sink, failed = None, False
+                    sink = DownloadSink(self, job[1], job[2])
+                
+                elif action == 'data':
+                    if sink is not None and not failed:
+                        sink.write(memoryview(job[1])[:job[2]])
+                
+                elif action == 'close' and sink is not None:
+                    sink.close()
+                    succeeded = job[1] and not failed and sink.verify()
+                    if succeeded:
+                        print(f"✓ Successfully downloaded {sink.file_info['filename']}")
+            
+            except Exception as e:
+                failed = True
+                print(f"Error writing download: {e}")
+            
+            finally:
+                # Always hand buffers back and report every file, or the network side would stall
+                if action == 'data':
+                    free_buffers.put(job[1])
+                elif action == 'close':
+                    results.append(succeeded)
+                    sink = None
+    
+    def open_download(self, filepath, file_size):
+        """Create the download file and reserve its full size on disk up front"""
+        fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+        if file_size > 0:
+            try:
+                # One allocation keeps the file contiguous instead of extending it write by write
+                os.posix_fallocate(fd, 0, file_size)
+            except (AttributeError, OSError):
+                # No posix_fallocate on this platform or filesystem; at least set the final size
+                os.ftruncate(fd, file_size)
+        return fd
+    
+    def write_at(self, fd, data, offset):
+        """Write all of data at offset, bypassing Python's buffered file layer; returns the new offset"""
+        view = memoryview(data)
+        while view:
+            if hasattr(os, 'pwrite'):
+                n = os.pwrite(fd, view, offset)
+            else:
+                os.lseek(fd, offset, os.SEEK_SET)
+                n = os.write(fd, view)
+            view = view[n:]
+            offset += n
+        return offset
+    
+    def close_download(self, fd, written, file_size):
+        """Close a download file, trimming the reserved space if the transfer stopped early"""
+        try:
+            if written != file_size:
+                os.ftruncate(fd, written)
+        finally:
+            os.close(fd)
+    
+    def new_decompressor(self, file_info):
+        """Create a streaming decompressor for the file's compression, or None if it was sent as-is"""
+        compression = file_info.get('compression')
+        if not compression:
+            return None
+        if compression == 'zstd':
+            return zstandard.ZstdDecompressor().decompressobj()
+        if compression == 'zlib':
+            return zlib.decompressobj()
+        raise ValueError(f"Unsupported compression '{compression}'")
+    
+    def describe_transfer(self, file_info):
+        """Summary of a file transfer for progress output"""
+        description = f"{file_info['file_size']} bytes, {file_info['num_chunks']} chunks"
+        if file_info.get('compression'):
+            description += f", {file_info['compression']}-compressed to {file_info['stream_size']} bytes"
+        return description
+    
+    def accept_digest(self):
+        """Digest algorithms to request in download commands; the server skips hashing for any other"""
+        if self.verify is False:
+            return []
+        algorithms = ['blake3'] if blake3 is not None else []
+        if self.verify:
+            algorithms.append('blake2b')
+        return algorithms
+    
+    def new_digest(self, file_info):
+        """Create a hasher matching the server's file digest, or None if it is not checked"""
+        algorithm = file_info.get('digest_algorithm')
+        if self.verify is False or not file_info.get('digest') or not algorithm:
+            return None
+        if algorithm == 'blake3':
+            return blake3.blake3() if blake3 is not None else None
+        if self.verify is None:
+            return None
+        try:
+            return hashlib.new(algorithm)
+        except ValueError:
+            return None
+    
+    def verify_digest(self, digest, file_info):
+        """Compare the digest of the received data with the one announced by the server"""
+        if digest is None:
+            return True
+        if digest.hexdigest() != file_info['digest']:
+            print(f"✗ Integrity check failed for {file_info['filename']}")
+            return False
+        return True
+    
+    def parse_file_info(self, response_data):
+        """Decode the server's reply to a download command; returns file_info, or None after reporting why not"""
+        if not response_data:
+            print("No response from server")
+            return None
+        
+        response = _loads(response_data)
+        
+        if response['type'] == 'error':
+            print(f"Error: {response['message']}")
+            return None
+        
+        if response['type'] != 'file_info':
+            print("Unexpected response from server")
+            return None
+        
+        return response
+    
+    def finish_download(self, sink, completion_data):
+        """Check the file_complete message and the digest once a file's data has been received"""
+        if completion_data:
+            completion = _loads(completion_data)
+            if completion['type'] == 'file_complete':
+                if not sink.verify():
+                    return False
+                print(f"✓ Successfully downloaded {sink.file_info['filename']}")
+                return True
+        
+        return False
+    
+    def list_files(self, refresh=False):
+        """Request and display list of available files, reusing a recent list unless refresh is True"""
+        try:
+            cache_age = time.monotonic() - self._files_cache_ts
+            if not refresh and self._files_cache is not None and cache_age < self.files_cache_ttl:
+                files = self._files_cache
+            else:
+                list_cmd = {'type': 'list_files'}
+                self.send_message(_dumps(list_cmd))
+                
+                response_data = self.receive_message()
+                if not response_data:
+                    print("No response from server")
+                    return []
+                
+                response = _loads(response_data)
+                
+                if response['type'] == 'error':
+                    print(f"Error: {response['message']}")
+                    return []
+                
+                files = response['files']
+                self._files_cache = files
+                self._files_cache_ts = time.monotonic()
             
             if not files:
                 print("No files available on the server")
@@ -116,75 +517,34 @@ class FileTransferClient:
         try:
             download_cmd = {
                 'type': 'download_file',
-                'filename': filename
+                'filename': filename,
+                'accept_compression': self.accept_compression,
+                'accept_digest': self.accept_digest()
             }
-            self.send_message(json.dumps(download_cmd))
+            self.send_message(_dumps(download_cmd))
             
             # First, receive file info
-            response_data = self.receive_message()
-            if not response_data:
-                print("No response from server")
-                return False
-            
-            response = json.loads(response_data)
-            
-            if response['type'] == 'error':
-                print(f"Error: {response['message']}")
-                return False
-            
-            if response['type'] != 'file_info':
-                print("Unexpected response from server")
+            response = self.parse_file_info(self.receive_message())
+            if response is None:
                 return False
             
             filename = response['filename']
-            file_size = response['file_size']
-            num_chunks = response['num_chunks']
             
-            print(f"\nDownloading {filename} ({file_size} bytes, {num_chunks} chunks)")
+            print(f"\nDownloading {filename} ({self.describe_transfer(response)})")
             
             # Prepare file for writing
             filepath = os.path.join(self.download_directory, filename)
             
-            with open(filepath, 'wb') as f:
-                total_received = 0
-                
-                for chunk_num in range(num_chunks):
-                    # Receive chunk info
-                    chunk_info_data = self.receive_message()
-                    if not chunk_info_data:
-                        print("Failed to receive chunk info")
-                        return False
-                    
-                    chunk_info = json.loads(chunk_info_data)
-                    chunk_size = chunk_info['chunk_size']
-                    chunk_number = chunk_info['chunk_number']
-                    
-                    # Receive chunk data
-                    chunk_data = b''
-                    while len(chunk_data) < chunk_size:
-                        remaining = chunk_size - len(chunk_data)
-                        data = self.socket.recv(min(remaining, self.buffer_size))
-                        if not data:
-                            print("Connection lost during file transfer")
-                            return False
-                        chunk_data += data
-                    
-                    f.write(chunk_data)
-                    total_received += len(chunk_data)
-                    
-                    # Calculate and display progress
-                    progress = (total_received / file_size) * 100
-                    print(f"Downloading {filename} part {chunk_number} .... {progress:.1f}%")
+            sink = DownloadSink(self, filepath, response)
+            try:
+                received = self.receive_file_data(sink)
+            finally:
+                sink.close()
+            if not received:
+                return False
             
             # Receive completion message
-            completion_data = self.receive_message()
-            if completion_data:
-                completion = json.loads(completion_data)
-                if completion['type'] == 'file_complete':
-                    print(f"✓ Successfully downloaded {filename}")
-                    return True
-            
-            return False
+            return self.finish_download(sink, self.receive_message())
             
         except Exception as e:
             print(f"Error downloading file: {e}")
@@ -195,9 +555,11 @@ class FileTransferClient:
         try:
             download_cmd = {
                 'type': 'download_multiple',
-                'filenames': filenames
+                'filenames': filenames,
+                'accept_compression': self.accept_compression,
+                'accept_digest': self.accept_digest()
             }
-            self.send_message(json.dumps(download_cmd))
+            self.send_message(_dumps(download_cmd))
             
             # Receive start message
             response_data = self.receive_message()
@@ -205,7 +567,7 @@ class FileTransferClient:
                 print("No response from server")
                 return False
             
-            response = json.loads(response_data)
+            response = _loads(response_data)
             
             if response['type'] == 'error':
                 print(f"Error: {response['message']}")
@@ -218,77 +580,77 @@ class FileTransferClient:
             total_files = response['total_files']
             print(f"\nStarting download of {total_files} files...")
             
-            # Download each file
-            for file_index in range(total_files):
-                print(f"\n--- File {file_index + 1}/{total_files} ---")
-                
-                # The server will send each file using the same protocol as single file download
-                # We need to handle file_info, chunks, and completion for each file
-                
-                # Receive file info
-                file_info_data = self.receive_message()
-                if not file_info_data:
-                    print("Failed to receive file info")
-                    return False
-                
-                file_info = json.loads(file_info_data)
-                
-                if file_info['type'] == 'error':
-                    print(f"Error: {file_info['message']}")
-                    continue
-                
-                filename = file_info['filename']
-                file_size = file_info['file_size']
-                num_chunks = file_info['num_chunks']
-                
-                print(f"Downloading {filename} ({file_size} bytes, {num_chunks} chunks)")
-                
-                # Download file chunks
-                filepath = os.path.join(self.download_directory, filename)
-                
-                with open(filepath, 'wb') as f:
-                    total_received = 0
+            # Disk writes happen on a writer thread so a slow write of one file does not hold up
+            # reading the next one from the network; a fixed pool of receive buffers cycles between
+            # the two and bounds the data in flight
+            free_buffers = queue.Queue()
+            for _ in range(self.pipeline_buffers):
+                free_buffers.put(bytearray(self.buffer_size))
+            jobs = queue.Queue()
+            results = []
+            opened = 0
+            writer_thread = threading.Thread(
+                target=self._write_downloads,
+                args=(jobs, free_buffers, results)
+            )
+            writer_thread.daemon = True
+            writer_thread.start()
+            
+            try:
+                # Download each file
+                for file_index in range(total_files):
+                    print(f"\n--- File {file_index + 1}/{total_files} ---")
                     
-                    for chunk_num in range(num_chunks):
-                        # Receive chunk info
-                        chunk_info_data = self.receive_message()
-                        if not chunk_info_data:
-                            print("Failed to receive chunk info")
-                            break
-                        
-                        chunk_info = json.loads(chunk_info_data)
-                        chunk_size = chunk_info['chunk_size']
-                        chunk_number = chunk_info['chunk_number']
-                        
-                        # Receive chunk data
-                        chunk_data = b''
-                        while len(chunk_data) < chunk_size:
-                            remaining = chunk_size - len(chunk_data)
-                            data = self.socket.recv(min(remaining, self.buffer_size))
-                            if not data:
-                                print("Connection lost during file transfer")
-                                break
-                            chunk_data += data
-                        
-                        f.write(chunk_data)
-                        total_received += len(chunk_data)
+                    # The server will send each file using the same protocol as single file download
+                    # We need to handle file_info, chunks, and completion for each file
+                    
+                    # Receive file info
+                    file_info_data = self.receive_message()
+                    if not file_info_data:
+                        print("Failed to receive file info")
+                        return False
+                    
+                    file_info = _loads(file_info_data)
+                    
+                    if file_info['type'] == 'error':
+                        print(f"Error: {file_info['message']}")
+                        continue
+                    
+                    filename = file_info['filename']
+                    
+                    print(f"Downloading {filename} ({self.describe_transfer(file_info)})")
+                    
+                    # Download file chunks
+                    filepath = os.path.join(self.download_directory, filename)
+                    
+                    jobs.put(('open', filepath, file_info))
+                    opened += 1
+                    completed = False
+                    try:
+                        if not self.receive_file_data_pipelined(file_info, jobs, free_buffers, writer_thread):
+                            return False
                         
-                        # Calculate and display progress
-                        progress = (total_received / file_size) * 100
-                        print(f"Downloading {filename} part {chunk_number} .... {progress:.1f}%")
+                        # Receive file completion message
+                        completion_data = self.receive_message()
+                        if completion_data:
+                            completion = _loads(completion_data)
+                            completed = completion['type'] == 'file_complete'
+                    finally:
+                        jobs.put(('close', completed))
                 
-                # Receive file completion message
-                completion_data = self.receive_message()
-                if completion_data:
-                    completion = json.loads(completion_data)
-                    if completion['type'] == 'file_complete':
-                        print(f"✓ Successfully downloaded {filename}")
-            
-            # Receive overall completion message
-            final_completion_data = self.receive_message()
+                # Receive overall completion message
+                final_completion_data = self.receive_message()
+            finally:
+                # Let the writer finish the queued data before reporting
+                jobs.put(None)
+                writer_thread.join()
+            
             if final_completion_data:
-                final_completion = json.loads(final_completion_data)
+                final_completion = _loads(final_completion_data)
                 if final_completion['type'] == 'multiple_transfer_complete':
+                    # A writer that died early leaves files without a result
+                    if len(results) != opened or not all(results):
+                        return False
                     print(f"\n✓ Successfully downloaded all {total_files} files!")
                     return True
             
@@ -297,6 +659,119 @@ class FileTransferClient:
         except Exception as e:
             print(f"Error downloading multiple files: {e}")
             return False
+    
+    def download_multiple_files_parallel(self, filenames, concurrency=4):
+        """Download multiple files over several concurrent connections"""
+        return asyncio.run(self.download_files_parallel(filenames, concurrency))
+    
+    async def download_files_parallel(self, filenames, concurrency=4):
+        """Download files concurrently, each over its own connection, at most concurrency at a time"""
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def bounded_download(filename):
+            async with semaphore:
+                return await self._download_one(filename)
+        
+        print(f"\nStarting parallel download of {len(filenames)} files ({concurrency} connections)...")
+        results = await asyncio.gather(*(bounded_download(filename) for filename in filenames))
+        
+        succeeded = sum(1 for result in results if result)
+        if succeeded == len(filenames):
+            print(f"\n✓ Successfully downloaded all {len(filenames)} files!")
+            return True
+        
+        print(f"\n✗ Downloaded {succeeded}/{len(filenames)} files")
+        return False
+    
+    async def _download_one(self, filename):
+        """Open a dedicated connection and download a single file over it"""
+        writer = None
+        try:
+            sock, address = self.create_socket()
+            sock.setblocking(False)
+            try:
+                await asyncio.get_running_loop().sock_connect(sock, address)
+            except BaseException:
+                sock.close()
+                raise
+            reader, writer = await asyncio.open_connection(sock=sock, limit=self.buffer_size)
+            
+            download_cmd = {
+                'type': 'download_file',
+                'filename': filename,
+                'accept_compression': self.accept_compression,
+                'accept_digest': self.accept_digest()
+            }
+            await self.send_message_async(writer, _dumps(download_cmd))
+            
+            # First, receive file info
+            response = self.parse_file_info(await self.receive_message_async(reader))
+            if response is None:
+                return False
+            
+            filename = response['filename']
+            
+            print(f"Downloading {filename} ({self.describe_transfer(response)})")
+            
+            filepath = os.path.join(self.download_directory, filename)
+            
+            loop = asyncio.get_running_loop()
+            sink = DownloadSink(self, filepath, response)
+            write = None
+            try:
+                progress = ReceiveProgress(response)
+                while not progress.done():
+                    data = await reader.read(progress.next_read(self.buffer_size))
+                    if not data:
+                        print(f"Connection lost during transfer of {filename}")
+                        return False
+                    
+                    # Decompress, hash and write on a worker thread so the event loop keeps reading
+                    # this and the other connections; waiting for the previous write keeps them in order
+                    if write is not None:
+                        await write
+                    write = loop.run_in_executor(None, sink.write, data)
+                    progress.advance(len(data))
+                
+                if write is not None:
+                    await write
+            finally:
+                if write is not None and not write.done():
+                    # Do not close the file under a write that is still running
+                    await asyncio.wait([write])
+                await loop.run_in_executor(None, sink.close)
+            
+            # Receive completion message
+            if not self.finish_download(sink, await self.receive_message_async(reader)):
+                return False
+            await self.send_message_async(writer, _dumps({'type': 'disconnect'}))
+            return True
+            
+        except Exception as e:
+            print(f"Error downloading {filename}: {e}")
+            return False
+        finally:
+            if writer is not None:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
+    
+    async def receive_message_async(self, reader):
+        """Receive a message with length prefix from a stream reader"""
+        try:
+            length_data = await reader.readexactly(4)
+            (message_length,) = _LEN_UNPACK(length_data)
+            message_data = await reader.readexactly(message_length)
+            return message_data
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+    
+    async def send_message_async(self, writer, message_bytes):
+        """Send an encoded message with length prefix and wait for the write buffer to drain"""
+        writer.write(_LEN_PACK(len(message_bytes)) + message_bytes)
+        await writer.drain()
 
 def show_menu():
     """Display the main menu"""
@@ -321,10 +796,10 @@ def main():
             choice = input("Enter your choice (1-4): ").strip()
             
             if choice == '1':
-                client.list_files()
+                client.list_files(refresh=True)
             
             elif choice == '2':
-                files = client.list_files()
+                files = client.list_files(refresh=False)
                 if files:
                     try:
                         file_index = int(input(f"\nEnter file number (1-{len(files)}): ")) - 1
@@ -339,7 +814,7 @@ def main():
                             client.download_file(filename)
             
             elif choice == '3':
-                files = client.list_files()
+                files = client.list_files(refresh=False)
                 if files:
                     print("\nEnter file numbers separated by commas (e.g., 1,2,3):")
                     try:
@@ -357,7 +832,11 @@ def main():
                             print(f"Selected files: {', '.join(filenames)}")
                             confirm = input("Proceed with download? (y/n): ").strip().lower()
                             if confirm in ['y', 'yes']:
-                                client.download_multiple_files(filenames)
+                                parallel = input("Use parallel connections? (y/n): ").strip().lower()
+                                if parallel in ['y', 'yes']:
+                                    client.download_multiple_files_parallel(filenames)
+                                else:
+                                    client.download_multiple_files(filenames)
                         else:
                             print("No valid files selected")
                     except ValueError:
@@ -4,20 +4,143 @@ File Transfer Server
 Supports multiple clients, file chunking, and directory listing
 """
 
+import argparse
+import asyncio
+import collections
+import contextlib
+import hashlib
 import socket
+import ssl
+import stat
+import struct
 import threading
 import os
+import queue
+import select
+import sys
 import json
-import time
+import tempfile
+import zlib
 from typing import List, Dict
 
+# orjson (optional) encodes/decodes in C; fall back to the standard library.
+# Either way messages are UTF-8 JSON bytes on the wire.
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj).encode('utf-8')
+    _loads = json.loads
+
+# Big-endian 4-byte length prefix of every control message
+_LEN = struct.Struct('>I')
+_LEN_UNPACK = _LEN.unpack_from
+_LEN_PACK = _LEN.pack
+
+# File digests use BLAKE3 (optional, SIMD-accelerated) when installed, otherwise BLAKE2b
+try:
+    import blake3
+    _new_digest = blake3.blake3
+    DIGEST_ALGORITHM = 'blake3'
+except ImportError:
+    _new_digest = hashlib.blake2b
+    DIGEST_ALGORITHM = 'blake2b'
+
+# zstd compression is used when zstandard is installed; zlib is always available
+try:
+    import zstandard
+    SUPPORTED_COMPRESSION = ('zstd', 'zlib')
+except ImportError:
+    zstandard = None
+    SUPPORTED_COMPRESSION = ('zlib',)
+
+# Already-compressed formats that would not shrink further
+PRECOMPRESSED_EXTENSIONS = {
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp3', '.mp4', '.mkv', '.avi', '.mov'
+}
+
+# Linux exposes TCP_CORK; macOS and FreeBSD have the equivalent TCP_NOPUSH, which the
+# socket module does not export. Its value differs between the BSDs (option 4 is
+# TCP_MD5SIG on OpenBSD), so other platforms go without corking.
+TCP_CORK = getattr(socket, 'TCP_CORK', None) or getattr(socket, 'TCP_NOPUSH', None)
+if TCP_CORK is None and (sys.platform == 'darwin' or sys.platform.startswith('freebsd')):
+    TCP_CORK = 4  # TCP_NOPUSH
+
+class PrefetchBuffer:
+    """Bytes read from a socket ahead of what has been consumed, kept in a reused preallocated buffer"""
+    
+    def __init__(self, size, read_size):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.read_size = read_size  # Bytes asked for per recv when only a few more are needed
+        self.start = 0  # First unconsumed byte
+        self.end = 0  # End of the received bytes
+    
+    def fill(self, sock, needed):
+        """Receive until at least needed bytes are buffered; False if the connection closed first"""
+        while self.end - self.start < needed:
+            if self.start + needed > len(self.buffer):
+                self.compact(needed)
+            want = max(self.read_size, needed - (self.end - self.start))
+            n = sock.recv_into(self.view[self.end:], min(want, len(self.buffer) - self.end))
+            if not n:
+                return False
+            self.end += n
+        return True
+    
+    def compact(self, needed):
+        """Move the unconsumed bytes to the front, growing the buffer only if needed does not fit"""
+        unread = self.end - self.start
+        if needed > len(self.buffer):
+            buffer = bytearray(needed)
+            buffer[:unread] = self.view[self.start:self.end]
+            self.buffer, self.view = buffer, memoryview(buffer)
+        else:
+            self.view[:unread] = self.view[self.start:self.end]
+        self.start, self.end = 0, unread
+    
+    def consume(self, nbytes):
+        """Mark nbytes as consumed"""
+        self.start += nbytes
+        if self.start == self.end:
+            self.start = self.end = 0
+    
+    def read_message(self, sock):
+        """Return the next length-prefixed message, or None if the connection closed first"""
+        if not self.fill(sock, _LEN.size):
+            return None
+        (message_length,) = _LEN_UNPACK(self.buffer, self.start)
+        total = _LEN.size + message_length
+        if not self.fill(sock, total):
+            return None
+        message = bytes(self.view[self.start + _LEN.size:self.start + total])
+        self.consume(total)
+        return message
+
 class FileTransferServer:
-    def __init__(self, host='localhost', port=8888, server_directory='server_files'):
+    def __init__(self, host='localhost', port=8888, server_directory='server_files', use_async=True,
+                 unix_socket_path=None, compressed_cache_dir=None):
         self.host = host
         self.port = port
+        self.unix_socket_path = unix_socket_path  # Listen on a Unix domain socket instead of TCP
         self.server_directory = server_directory
+        self.use_async = use_async  # asyncio event loop, or one thread per client when False
         self.chunk_size = 1024 * 1024  # 1MB chunks
-        self.buffer_size = 4096
+        self.buffer_size = 65536
+        self.prefetch_size = 4096  # receive_message reads this much per recv and keeps the leftover
+        self.socket_buffer_size = 4 * 1024 * 1024  # 4MB kernel send/receive buffers
+        self._digest_cache = {}  # filepath -> ((mtime_ns, size), hex digest)
+        self.compressed_cache_limit = 256 * 1024 * 1024  # Bytes of compressed copies kept on disk
+        # (filepath, compression) -> ((mtime_ns, size), path of the compressed copy or None if it did
+        # not shrink, compressed size), least recently used first
+        self._compressed_cache = collections.OrderedDict()
+        self._compressed_bytes = 0
+        self._compressed_lock = threading.Lock()
+        # Compressed copies live under compressed_cache_dir (system temp dir by default) until shutdown
+        self._compressed_dir = tempfile.TemporaryDirectory(prefix='ft-compressed-', dir=compressed_cache_dir)
         
         # Create server directory if it doesn't exist
         if not os.path.exists(self.server_directory):
@@ -26,19 +149,35 @@ class FileTransferServer:
     
     def start_server(self):
         """Start the server and listen for connections"""
+        if self.use_async:
+            try:
+                asyncio.run(self.start_async_server())
+            except OSError as e:
+                print(f"Server error: {e}")
+            return
+        
+        server_socket = None
+        bound_unix_socket = False
         try:
-            server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            server_socket.bind((self.host, self.port))
+            if self.unix_socket_path:
+                self.remove_stale_unix_socket()
+                server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                server_socket.bind(self.unix_socket_path)
+                bound_unix_socket = True
+            else:
+                server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                server_socket.bind((self.host, self.port))
             server_socket.listen(5)
             
-            print(f"Server started on {self.host}:{self.port}")
+            print(f"Server started on {self.describe_address()}")
             print(f"Server directory: {os.path.abspath(self.server_directory)}")
             print("Waiting for connections...")
             
             while True:
                 client_socket, client_address = server_socket.accept()
                 print(f"Connection established with {client_address}")
+                self.configure_client_socket(client_socket)
                 
                 # Handle each client in a separate thread
                 client_thread = threading.Thread(
@@ -51,18 +190,57 @@ class FileTransferServer:
         except Exception as e:
             print(f"Server error: {e}")
         finally:
-            server_socket.close()
+            if server_socket is not None:
+                server_socket.close()
+            if bound_unix_socket:
+                self.remove_unix_socket()
+    
+    def describe_address(self):
+        """Human-readable listening address"""
+        if self.unix_socket_path:
+            return f"unix:{self.unix_socket_path}"
+        return f"{self.host}:{self.port}"
+    
+    def remove_stale_unix_socket(self):
+        """Remove a leftover socket file at the Unix socket path; refuse other files and live servers"""
+        try:
+            mode = os.lstat(self.unix_socket_path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise OSError(f"{self.unix_socket_path} exists and is not a socket")
+        
+        # The socket file is only stale if nothing accepts connections on it any more
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.unix_socket_path)
+        except ConnectionRefusedError:
+            os.unlink(self.unix_socket_path)
+            return
+        finally:
+            probe.close()
+        raise OSError(f"Another server is already listening on {self.unix_socket_path}")
+    
+    def remove_unix_socket(self):
+        """Remove the socket file this server bound, if it is still there"""
+        try:
+            if stat.S_ISSOCK(os.lstat(self.unix_socket_path).st_mode):
+                os.unlink(self.unix_socket_path)
+        except FileNotFoundError:
+            pass
     
     def handle_client(self, client_socket, client_address):
         """Handle individual client connections"""
+        # Bytes received on this connection but not yet consumed, in a buffer reused for every command
+        prefetch = PrefetchBuffer(self.buffer_size, self.prefetch_size)
         try:
             while True:
                 # Receive command from client
-                command_data = self.receive_message(client_socket)
+                command_data = self.receive_message(client_socket, prefetch)
                 if not command_data:
                     break
                 
-                command = json.loads(command_data)
+                command = _loads(command_data)
                 cmd_type = command.get('type')
                 
                 if cmd_type == 'list_files':
@@ -70,11 +248,17 @@ class FileTransferServer:
                 
                 elif cmd_type == 'download_file':
                     filename = command.get('filename')
-                    self.send_file(client_socket, filename)
+                    self.send_file(
+                        client_socket, filename,
+                        command.get('accept_compression'), command.get('accept_digest')
+                    )
                 
                 elif cmd_type == 'download_multiple':
                     filenames = command.get('filenames')
-                    self.send_multiple_files(client_socket, filenames)
+                    self.send_multiple_files(
+                        client_socket, filenames,
+                        command.get('accept_compression'), command.get('accept_digest')
+                    )
                 
                 elif cmd_type == 'disconnect':
                     break
@@ -85,54 +269,212 @@ class FileTransferServer:
             client_socket.close()
             print(f"Connection with {client_address} closed")
     
-    def receive_message(self, client_socket):
-        """Receive a message with length prefix"""
+    def configure_client_socket(self, client_socket):
+        """Tune a client socket for small control messages and bulk file data"""
         try:
-            # First receive the length of the message
-            length_data = client_socket.recv(4)
-            if not length_data:
-                return None
-            
-            message_length = int.from_bytes(length_data, byteorder='big')
-            
-            # Then receive the actual message
-            message_data = b''
-            while len(message_data) < message_length:
-                chunk = client_socket.recv(min(message_length - len(message_data), self.buffer_size))
-                if not chunk:
-                    return None
-                message_data += chunk
-            
-            return message_data.decode('utf-8')
+            if client_socket.family in (socket.AF_INET, socket.AF_INET6):
+                client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.socket_buffer_size)
+            client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.socket_buffer_size)
+        except OSError as e:
+            print(f"Could not set socket options: {e}")
+    
+    def set_cork(self, client_socket, enabled):
+        """Hold back partial segments (TCP_CORK/TCP_NOPUSH) so headers and data are coalesced"""
+        if TCP_CORK is None or client_socket.family not in (socket.AF_INET, socket.AF_INET6):
+            return
+        try:
+            client_socket.setsockopt(socket.IPPROTO_TCP, TCP_CORK, 1 if enabled else 0)
+        except OSError:
+            pass
+    
+    def receive_message(self, client_socket, prefetch):
+        """Receive a message with length prefix, keeping any bytes read past it in prefetch"""
+        try:
+            # Read in prefetch-sized gulps so a small command usually takes a single recv
+            return prefetch.read_message(client_socket)
         except:
             return None
     
-    def send_message(self, client_socket, message):
-        """Send a message with length prefix"""
-        message_bytes = message.encode('utf-8')
-        length_bytes = len(message_bytes).to_bytes(4, byteorder='big')
-        client_socket.send(length_bytes + message_bytes)
+    def send_message(self, client_socket, message_bytes):
+        """Send an encoded message with length prefix"""
+        length_bytes = _LEN_PACK(len(message_bytes))
+        client_socket.sendall(length_bytes + message_bytes)
     
-    def send_file_list(self, client_socket):
-        """Send list of available files to client"""
-        try:
-            files = []
-            for filename in os.listdir(self.server_directory):
-                filepath = os.path.join(self.server_directory, filename)
-                if os.path.isfile(filepath):
-                    file_size = os.path.getsize(filepath)
+    def _send_framed_with_payload(self, client_socket, header_bytes, payload):
+        """Send a length-prefixed header followed by raw payload bytes in one gathered write"""
+        buffers = [_LEN_PACK(len(header_bytes)), header_bytes, payload]
+        
+        if not hasattr(client_socket, 'sendmsg'):
+            # No scatter/gather support (e.g. Windows)
+            client_socket.sendall(b''.join(buffers))
+            return
+        
+        while buffers:
+            sent = client_socket.sendmsg(buffers)
+            # Drop fully sent buffers and trim a partially sent one
+            while buffers and sent >= len(buffers[0]):
+                sent -= len(buffers[0])
+                buffers.pop(0)
+            if buffers:
+                buffers[0] = memoryview(buffers[0])[sent:]
+    
+    def read_payload(self, f, filename, stream_size):
+        """Read a small file's whole stream, checking it still has the announced size"""
+        payload = f.read(stream_size)
+        if len(payload) < stream_size:
+            raise IOError(f"File '{filename}' was truncated during transfer")
+        return payload
+    
+    def build_file_list(self):
+        """Collect name and size information for every file in the server directory"""
+        files = []
+        # scandir's DirEntry reuses the directory read for is_file() and caches stat()
+        with os.scandir(self.server_directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    file_size = entry.stat().st_size
                     files.append({
-                        'name': filename,
+                        'name': entry.name,
                         'size': file_size,
-                        'size_mb': round(file_size / (1024 * 1024), 2)
+                        'size_mb': round(file_size / 1048576, 2)
                     })
+        return files
+    
+    def build_file_info(self, filename, file_size, digest, stream_size, compression):
+        """Build the file_info metadata message sent ahead of the file data"""
+        return {
+            'type': 'file_info',
+            'filename': filename,
+            'file_size': file_size,
+            'stream_size': stream_size,  # Bytes that follow on the wire (compressed size if compressed)
+            'compression': compression,
+            'num_chunks': (stream_size + self.chunk_size - 1) // self.chunk_size,
+            'chunk_size': self.chunk_size,
+            'digest': digest,  # None unless the client asked for this algorithm in accept_digest
+            'digest_algorithm': DIGEST_ALGORITHM if digest else None
+        }
+    
+    def choose_compression(self, filename, accept_compression):
+        """Pick the client's most preferred compression we support, or None for already-compressed files"""
+        if not accept_compression:
+            return None
+        if os.path.splitext(filename)[1].lower() in PRECOMPRESSED_EXTENSIONS:
+            return None
+        for compression in accept_compression:
+            if compression in SUPPORTED_COMPRESSION:
+                return compression
+        return None
+    
+    def compress_stream(self, source, destination, compression):
+        """Compress the whole of source into destination"""
+        if compression == 'zstd':
+            zstandard.ZstdCompressor(level=3, threads=-1).copy_stream(source, destination)
+            return
+        
+        compressor = zlib.compressobj(1)  # Fastest level; repetitive text still shrinks a lot
+        for chunk_data in iter(lambda: source.read(self.chunk_size), b''):
+            destination.write(compressor.compress(chunk_data))
+        destination.write(compressor.flush())
+    
+    def open_compressed_copy(self, stack, filepath, compression):
+        """Open a cached compressed copy of the file on stack, or return None if it does not shrink"""
+        file_stat = os.stat(filepath)
+        key = (file_stat.st_mtime_ns, file_stat.st_size)
+        cache_key = (filepath, compression)
+        with self._compressed_lock:
+            cached = self._compressed_cache.get(cache_key)
+            if cached is not None and cached[0] == key:
+                self._compressed_cache.move_to_end(cache_key)
+                if cached[1] is None:
+                    return None
+                # Opened under the lock so eviction cannot remove the copy first
+                return stack.enter_context(open(cached[1], 'rb'))
+        
+        # Compress into a real file so the result can still go out with sendfile. The open file stays
+        # readable after its path is unlinked by eviction or a lost race (on POSIX)
+        fd, compressed_path = tempfile.mkstemp(dir=self._compressed_dir.name)
+        compressed = stack.enter_context(open(fd, 'w+b'))
+        with open(filepath, 'rb') as source:
+            self.compress_stream(source, compressed, compression)
+        compressed_size = compressed.tell()
+        compressed.seek(0)
+        
+        if compressed_size >= file_stat.st_size:
+            # Did not shrink; remember that so the file is sent as-is without trying again
+            self._unlink_quietly(compressed_path)
+            compressed, compressed_path, compressed_size = None, None, 0
+        
+        with self._compressed_lock:
+            cached = self._compressed_cache.get(cache_key)
+            if cached is not None and cached[0] == key:
+                # Another thread compressed the same version first; keep its copy
+                self._unlink_quietly(compressed_path)
+                return compressed
+            if cached is not None:
+                self._evict_compressed(cache_key)
+            
+            if compressed_size > self.compressed_cache_limit:
+                self._unlink_quietly(compressed_path)  # Too big to keep; send it once from the open file
+                return compressed
+            
+            self._compressed_cache[cache_key] = (key, compressed_path, compressed_size)
+            self._compressed_bytes += compressed_size
+            while self._compressed_bytes > self.compressed_cache_limit:
+                self._evict_compressed(next(iter(self._compressed_cache)))
+        return compressed
+    
+    def _evict_compressed(self, cache_key):
+        """Drop a compressed copy from the cache and the disk; caller holds _compressed_lock"""
+        _, compressed_path, compressed_size = self._compressed_cache.pop(cache_key)
+        self._compressed_bytes -= compressed_size
+        self._unlink_quietly(compressed_path)
+    
+    def _unlink_quietly(self, path):
+        """Remove a file if there is one, ignoring failures (e.g. still open on Windows)"""
+        if path is not None:
+            with contextlib.suppress(OSError):
+                os.unlink(path)
+    
+    def open_file_stream(self, stack, filepath, filename, file_size, accept_compression):
+        """Open the file, or a cached compressed copy of it, on stack; returns (file, stream_size, compression)"""
+        compression = self.choose_compression(filename, accept_compression)
+        if compression is not None:
+            compressed = self.open_compressed_copy(stack, filepath, compression)
+            if compressed is not None:
+                return compressed, os.fstat(compressed.fileno()).st_size, compression
+        
+        f = stack.enter_context(open(filepath, 'rb'))
+        return f, file_size, None
+    
+    def file_digest(self, filepath):
+        """Digest of a file's contents, recomputed only when its size or mtime changes"""
+        file_stat = os.stat(filepath)
+        key = (file_stat.st_mtime_ns, file_stat.st_size)
+        cached = self._digest_cache.get(filepath)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        
+        digest = _new_digest()
+        with open(filepath, 'rb') as f:
+            for chunk_data in iter(lambda: f.read(self.chunk_size), b''):
+                digest.update(chunk_data)
+        
+        hexdigest = digest.hexdigest()
+        self._digest_cache[filepath] = (key, hexdigest)
+        return hexdigest
+    
+    def send_file_list(self, client_socket):
+        """Send list of available files to client"""
+        try:
+            files = self.build_file_list()
             
             response = {
                 'type': 'file_list',
                 'files': files
             }
             
-            self.send_message(client_socket, json.dumps(response))
+            self.send_message(client_socket, _dumps(response))
             print(f"Sent file list with {len(files)} files")
             
         except Exception as e:
@@ -140,10 +482,11 @@ class FileTransferServer:
                 'type': 'error',
                 'message': f"Error listing files: {str(e)}"
             }
-            self.send_message(client_socket, json.dumps(error_response))
+            self.send_message(client_socket, _dumps(error_response))
     
-    def send_file(self, client_socket, filename):
+    def send_file(self, client_socket, filename, accept_compression=None, accept_digest=None):
         """Send a single file to client with chunking support"""
+        header_sent = False
         try:
             filepath = os.path.join(self.server_directory, filename)
             
@@ -152,61 +495,152 @@ class FileTransferServer:
                     'type': 'error',
                     'message': f"File '{filename}' not found"
                 }
-                self.send_message(client_socket, json.dumps(error_response))
+                self.send_message(client_socket, _dumps(error_response))
                 return
             
             file_size = os.path.getsize(filepath)
             
-            # Calculate number of chunks needed
-            num_chunks = (file_size + self.chunk_size - 1) // self.chunk_size
-            
-            # Send file metadata
-            file_info = {
-                'type': 'file_info',
-                'filename': filename,
-                'file_size': file_size,
-                'num_chunks': num_chunks,
-                'chunk_size': self.chunk_size
-            }
-            self.send_message(client_socket, json.dumps(file_info))
-            
-            # Send file chunks
-            with open(filepath, 'rb') as f:
-                for chunk_num in range(num_chunks):
-                    chunk_data = f.read(self.chunk_size)
-                    
-                    chunk_info = {
-                        'type': 'file_chunk',
-                        'chunk_number': chunk_num + 1,
-                        'total_chunks': num_chunks,
-                        'chunk_size': len(chunk_data)
-                    }
-                    
-                    # Send chunk metadata
-                    self.send_message(client_socket, json.dumps(chunk_info))
-                    
-                    # Send chunk data
-                    client_socket.send(chunk_data)
-                    
-                    print(f"Sent chunk {chunk_num + 1}/{num_chunks} of {filename}")
-                    time.sleep(0.1)  # Small delay to prevent overwhelming the client
+            with contextlib.ExitStack() as stack:
+                f, stream_size, compression = self.open_file_stream(
+                    stack, filepath, filename, file_size, accept_compression
+                )
+                
+                # Send file metadata; the digest only if the client will check it
+                digest = self.file_digest(filepath) if DIGEST_ALGORITHM in (accept_digest or ()) else None
+                file_info = self.build_file_info(filename, file_size, digest, stream_size, compression)
+                num_chunks = file_info['num_chunks']
+                
+                if stream_size <= self.buffer_size:
+                    # Small file: metadata and data leave in a single syscall
+                    payload = self.read_payload(f, filename, stream_size)
+                    header_sent = True
+                    self._send_framed_with_payload(client_socket, _dumps(file_info), payload)
+                else:
+                    # Cork the socket so the headers go out in the same segments as the file data
+                    self.set_cork(client_socket, True)
+                    try:
+                        header_sent = True
+                        self.send_message(client_socket, _dumps(file_info))
+                        
+                        # Stream the raw file data; file_info already tells the client how much to read
+                        self.send_file_data(client_socket, f, filename, stream_size, num_chunks)
+                    finally:
+                        self.set_cork(client_socket, False)
             
             # Send completion message
             completion_msg = {
                 'type': 'file_complete',
                 'filename': filename
             }
-            self.send_message(client_socket, json.dumps(completion_msg))
+            self.send_message(client_socket, _dumps(completion_msg))
             print(f"File '{filename}' sent successfully")
             
         except Exception as e:
+            if header_sent:
+                # The client is reading raw file bytes now and would take an error frame as data;
+                # let the caller drop the connection instead
+                raise
             error_response = {
                 'type': 'error',
                 'message': f"Error sending file: {str(e)}"
             }
-            self.send_message(client_socket, json.dumps(error_response))
+            self.send_message(client_socket, _dumps(error_response))
     
-    def send_multiple_files(self, client_socket, filenames):
+    def send_file_data(self, client_socket, f, filename, file_size, num_chunks):
+        """Send the file data with os.sendfile so it never leaves the kernel"""
+        if file_size == 0:
+            return  # Nothing to send; sendfile rejects a zero count
+        
+        sent = 0
+        # os.sendfile on a TLS socket's descriptor would write plaintext past the TLS layer
+        if hasattr(os, 'sendfile') and not isinstance(client_socket, ssl.SSLSocket):
+            out_fd = client_socket.fileno()
+            in_fd = f.fileno()
+            try:
+                while sent < file_size:
+                    try:
+                        n = os.sendfile(out_fd, in_fd, sent, file_size - sent)
+                    except BlockingIOError:
+                        # Non-blocking socket with a full send buffer: wait until it drains
+                        select.select([], [client_socket], [], client_socket.gettimeout())
+                        continue
+                    if n == 0:
+                        break
+                    sent += n
+            except OSError:
+                pass  # sendfile does not support this file or socket type here
+            else:
+                if sent < file_size:
+                    raise IOError(f"File '{filename}' was truncated during transfer")
+                return
+        
+        # Continue from wherever sendfile stopped with a read/send loop
+        f.seek(sent)
+        self.send_file_data_fallback(client_socket, f, filename, file_size, num_chunks)
+    
+    def send_file_data_fallback(self, client_socket, f, filename, file_size, num_chunks):
+        """Send the remaining file data, reading the next chunk from disk while the current one is sent"""
+        sent = f.tell()
+        
+        # Bounded queue between the disk reader thread and this sender keeps at most two chunks in memory
+        chunks = queue.Queue(maxsize=2)
+        stop = threading.Event()
+        reader_thread = threading.Thread(
+            target=self._read_chunks,
+            args=(f, file_size, chunks, stop)
+        )
+        reader_thread.daemon = True
+        reader_thread.start()
+        
+        try:
+            while True:
+                chunk_data = chunks.get()
+                if chunk_data is None:
+                    break
+                if isinstance(chunk_data, Exception):
+                    raise chunk_data
+                
+                client_socket.sendall(chunk_data)
+                sent += len(chunk_data)
+                
+                # TCP flow control already paces sendall; only throttle the logging
+                chunk_num = (sent + self.chunk_size - 1) // self.chunk_size
+                if chunk_num % 64 == 0 or sent == file_size:
+                    print(f"Sent chunk {chunk_num}/{num_chunks} of {filename}")
+        finally:
+            stop.set()
+            reader_thread.join()
+        
+        if sent < file_size:
+            raise IOError(f"File '{filename}' was truncated during transfer")
+    
+    def _read_chunks(self, f, file_size, chunks, stop):
+        """Reader thread: queue file chunks, then None (or the error that stopped reading)"""
+        end_item = None
+        try:
+            remaining = file_size - f.tell()
+            while remaining > 0:
+                chunk_data = f.read(min(self.chunk_size, remaining))
+                if not chunk_data:
+                    break
+                remaining -= len(chunk_data)
+                if not self._put_chunk(chunks, chunk_data, stop):
+                    return
+        except OSError as e:
+            end_item = e
+        self._put_chunk(chunks, end_item, stop)
+    
+    def _put_chunk(self, chunks, item, stop):
+        """Queue an item for the sender, giving up if the sender has stopped"""
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def send_multiple_files(self, client_socket, filenames, accept_compression=None, accept_digest=None):
         """Send multiple files to client"""
         try:
             # Send start message for multiple file transfer
@@ -215,29 +649,246 @@ class FileTransferServer:
                 'total_files': len(filenames),
                 'filenames': filenames
             }
-            self.send_message(client_socket, json.dumps(start_msg))
+            self.send_message(client_socket, _dumps(start_msg))
             
-            # Send each file
-            for i, filename in enumerate(filenames):
-                print(f"Sending file {i+1}/{len(filenames)}: {filename}")
-                self.send_file(client_socket, filename)
+        except Exception as e:
+            error_response = {
+                'type': 'error',
+                'message': f"Error in multiple file transfer: {str(e)}"
+            }
+            self.send_message(client_socket, _dumps(error_response))
+            return
+        
+        # Send each file; a failure once a file's data has started closes the connection
+        for i, filename in enumerate(filenames):
+            print(f"Sending file {i+1}/{len(filenames)}: {filename}")
+            self.send_file(client_socket, filename, accept_compression, accept_digest)
+        
+        # Send completion message
+        completion_msg = {
+            'type': 'multiple_transfer_complete',
+            'total_files': len(filenames)
+        }
+        self.send_message(client_socket, _dumps(completion_msg))
+        print(f"Multiple file transfer completed: {len(filenames)} files sent")
+    
+    # asyncio implementation: one coroutine per client instead of one thread
+    
+    async def start_async_server(self):
+        """Start the asyncio server and serve connections until cancelled"""
+        if self.unix_socket_path:
+            self.remove_stale_unix_socket()
+            server = await asyncio.start_unix_server(self.handle_client_async, self.unix_socket_path)
+        else:
+            server = await asyncio.start_server(
+                self.handle_client_async, self.host, self.port, reuse_address=True
+            )
+        
+        print(f"Server started on {self.describe_address()}")
+        print(f"Server directory: {os.path.abspath(self.server_directory)}")
+        print("Waiting for connections...")
+        
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self.unix_socket_path:
+                self.remove_unix_socket()
+    
+    async def handle_client_async(self, reader, writer):
+        """Handle individual client connections on the event loop"""
+        client_address = writer.get_extra_info('peername')
+        print(f"Connection established with {client_address}")
+        self.configure_client_socket(writer.get_extra_info('socket'))
+        
+        try:
+            while True:
+                # Receive command from client
+                command_data = await self.receive_message_async(reader)
+                if not command_data:
+                    break
+                
+                command = _loads(command_data)
+                cmd_type = command.get('type')
+                
+                if cmd_type == 'list_files':
+                    await self.send_file_list_async(writer)
+                
+                elif cmd_type == 'download_file':
+                    filename = command.get('filename')
+                    await self.send_file_async(
+                        writer, filename,
+                        command.get('accept_compression'), command.get('accept_digest')
+                    )
+                
+                elif cmd_type == 'download_multiple':
+                    filenames = command.get('filenames')
+                    await self.send_multiple_files_async(
+                        writer, filenames,
+                        command.get('accept_compression'), command.get('accept_digest')
+                    )
+                
+                elif cmd_type == 'disconnect':
+                    break
+                
+        except Exception as e:
+            print(f"Error handling client {client_address}: {e}")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            print(f"Connection with {client_address} closed")
+    
+    async def receive_message_async(self, reader):
+        """Receive a message with length prefix from a stream reader"""
+        try:
+            length_data = await reader.readexactly(4)
+            (message_length,) = _LEN_UNPACK(length_data)
+            message_data = await reader.readexactly(message_length)
+            return message_data
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+    
+    async def send_message_async(self, writer, message_bytes):
+        """Send an encoded message with length prefix and wait for the write buffer to drain"""
+        writer.write(_LEN_PACK(len(message_bytes)) + message_bytes)
+        await writer.drain()
+    
+    async def send_file_list_async(self, writer):
+        """Send list of available files to client"""
+        try:
+            files = self.build_file_list()
+            
+            response = {
+                'type': 'file_list',
+                'files': files
+            }
+            
+            await self.send_message_async(writer, _dumps(response))
+            print(f"Sent file list with {len(files)} files")
+            
+        except Exception as e:
+            error_response = {
+                'type': 'error',
+                'message': f"Error listing files: {str(e)}"
+            }
+            await self.send_message_async(writer, _dumps(error_response))
+    
+    async def send_file_async(self, writer, filename, accept_compression=None, accept_digest=None):
+        """Send a single file to client, using the event loop's zero-copy sendfile"""
+        header_sent = False
+        try:
+            filepath = os.path.join(self.server_directory, filename)
+            
+            if not os.path.exists(filepath):
+                error_response = {
+                    'type': 'error',
+                    'message': f"File '{filename}' not found"
+                }
+                await self.send_message_async(writer, _dumps(error_response))
+                return
+            
+            file_size = os.path.getsize(filepath)
+            loop = asyncio.get_running_loop()
+            
+            with contextlib.ExitStack() as stack:
+                # Hashing and compression may read the whole file, so keep them off the event loop;
+                # the digest is only computed if the client will check it
+                digest = None
+                if DIGEST_ALGORITHM in (accept_digest or ()):
+                    digest = await loop.run_in_executor(None, self.file_digest, filepath)
+                f, stream_size, compression = await loop.run_in_executor(
+                    None, self.open_file_stream, stack, filepath, filename, file_size, accept_compression
+                )
+                
+                # Send file metadata
+                file_info = self.build_file_info(filename, file_size, digest, stream_size, compression)
+                
+                if stream_size <= self.buffer_size:
+                    # Small file: metadata and data go out in a single gathered write
+                    payload = self.read_payload(f, filename, stream_size)
+                    header_bytes = _dumps(file_info)
+                    header_sent = True
+                    writer.writelines([_LEN_PACK(len(header_bytes)), header_bytes, payload])
+                    await writer.drain()
+                else:
+                    client_socket = writer.get_extra_info('socket')
+                    self.set_cork(client_socket, True)
+                    try:
+                        header_sent = True
+                        await self.send_message_async(writer, _dumps(file_info))
+                        
+                        # loop.sendfile uses os.sendfile when it can and falls back
+                        # to a read/send loop otherwise (e.g. TLS transports); it rejects a zero count
+                        # and stops early, without an error, at the end of a file that has shrunk
+                        if stream_size:
+                            sent = await loop.sendfile(writer.transport, f, 0, stream_size)
+                            if sent < stream_size:
+                                raise IOError(f"File '{filename}' was truncated during transfer")
+                    finally:
+                        self.set_cork(client_socket, False)
             
             # Send completion message
             completion_msg = {
-                'type': 'multiple_transfer_complete',
-                'total_files': len(filenames)
+                'type': 'file_complete',
+                'filename': filename
+            }
+            await self.send_message_async(writer, _dumps(completion_msg))
+            print(f"File '{filename}' sent successfully")
+            
+        except Exception as e:
+            if header_sent:
+                # The client is reading raw file bytes now and would take an error frame as data;
+                # let the caller drop the connection instead
+                raise
+            error_response = {
+                'type': 'error',
+                'message': f"Error sending file: {str(e)}"
+            }
+            await self.send_message_async(writer, _dumps(error_response))
+    
+    async def send_multiple_files_async(self, writer, filenames, accept_compression=None, accept_digest=None):
+        """Send multiple files to client"""
+        try:
+            # Send start message for multiple file transfer
+            start_msg = {
+                'type': 'multiple_transfer_start',
+                'total_files': len(filenames),
+                'filenames': filenames
             }
-            self.send_message(client_socket, json.dumps(completion_msg))
-            print(f"Multiple file transfer completed: {len(filenames)} files sent")
+            await self.send_message_async(writer, _dumps(start_msg))
             
         except Exception as e:
             error_response = {
                 'type': 'error',
                 'message': f"Error in multiple file transfer: {str(e)}"
             }
-            self.send_message(client_socket, json.dumps(error_response))
+            await self.send_message_async(writer, _dumps(error_response))
+            return
+        
+        # Send each file; a failure once a file's data has started closes the connection
+        for i, filename in enumerate(filenames):
+            print(f"Sending file {i+1}/{len(filenames)}: {filename}")
+            await self.send_file_async(writer, filename, accept_compression, accept_digest)
+        
+        # Send completion message
+        completion_msg = {
+            'type': 'multiple_transfer_complete',
+            'total_files': len(filenames)
+        }
+        await self.send_message_async(writer, _dumps(completion_msg))
+        print(f"Multiple file transfer completed: {len(filenames)} files sent")
 
 def main():
+    parser = argparse.ArgumentParser(description="File Transfer Server")
+    parser.add_argument('--unix-socket', metavar='PATH',
+                        help="listen on a Unix domain socket instead of TCP (same-host clients only)")
+    parser.add_argument('--compressed-cache-dir', metavar='DIR',
+                        help="directory for cached compressed copies of files (default: system temp dir)")
+    args = parser.parse_args()
+    
     # Create some sample files for testing
     server_dir = 'server_files'
     if not os.path.exists(server_dir):
@@ -258,7 +909,7 @@ def main():
             print(f"Created sample file: {filename}")
     
     # Start the server
-    server = FileTransferServer()
+    server = FileTransferServer(unix_socket_path=args.unix_socket, compressed_cache_dir=args.compressed_cache_dir)
     try:
         server.start_server()
     except KeyboardInterrupt:
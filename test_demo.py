@@ -4,12 +4,16 @@ Demo script to test all file transfer functionality
 """
 
 import os
+import socket
 import sys
 import threading
 import time
 import subprocess
 from client import FileTransferClient
 
+# Client and server share a host, so skip the TCP/IP stack where Unix sockets exist
+UNIX_SOCKET_PATH = '/tmp/ftserver.sock' if hasattr(socket, 'AF_UNIX') else None
+
 def create_large_test_file():
     """Create a large test file (>1MB) to demonstrate chunking"""
     server_dir = 'server_files'
@@ -29,7 +33,10 @@ def create_large_test_file():
 def run_server():
     """Run the server in a separate process"""
     print("Starting server...")
-    server_process = subprocess.Popen([sys.executable, 'server.py'], 
+    server_command = [sys.executable, 'server.py']
+    if UNIX_SOCKET_PATH:
+        server_command += ['--unix-socket', UNIX_SOCKET_PATH]
+    server_process = subprocess.Popen(server_command, 
                                      stdout=subprocess.PIPE, 
                                      stderr=subprocess.PIPE)
     time.sleep(2)  # Give server time to start
@@ -44,7 +51,7 @@ def demo_client_functionality():
     # Wait for server to start
     time.sleep(3)
     
-    client = FileTransferClient()
+    client = FileTransferClient(unix_socket_path=UNIX_SOCKET_PATH)
     
     print("\n1. CONNECTING TO SERVER")
     print("-" * 30)
@@ -80,8 +87,17 @@ def demo_client_functionality():
             print("✓ Multiple file download completed successfully!")
         else:
             print("✗ Multiple file download failed!")
+        
+        print("\n5. PARALLEL MULTIPLE FILE DOWNLOAD DEMONSTRATION")
+        print("-" * 51)
+        print(f"Downloading multiple files over separate connections: {', '.join(selected_files)}")
+        success = client.download_multiple_files_parallel(selected_files)
+        if success:
+            print("✓ Parallel multiple file download completed successfully!")
+        else:
+            print("✗ Parallel multiple file download failed!")
     
-    print("\n5. VERIFYING DOWNLOADED FILES")
+    print("\n6. VERIFYING DOWNLOADED FILES")
     print("-" * 32)
     download_dir = client.download_directory
     if os.path.exists(download_dir):
@@ -108,6 +124,7 @@ def main():
     print("- Directory listing")
     print("- Single file download")
     print("- Multiple file download")
+    print("- Parallel multiple file download")
     print("- File chunking (for files >1MB)")
     print("- Progress tracking")
     